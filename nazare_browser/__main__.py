@@ -14,6 +14,7 @@ import json
 from typing import Optional
 
 from .core.browser import Browser
+from .llm.controller import close_client
 from .config.settings import Settings
 from .exceptions import BrowserError, ConfigurationError
 
@@ -201,6 +202,9 @@ async def run_browser(settings: Settings):
     except Exception as e:
         console.print(f"[red]Error closing browser: {str(e)}[/red]")
         logging.exception("Error closing browser")
+    finally:
+        # The LLM client is shared process-wide, so it is only closed on exit
+        await close_client()
 
 if __name__ == "__main__":
     app() 
\ No newline at end of file
@@ -1,78 +1,421 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
 import json
 import logging
 from playwright.async_api import Page, ElementHandle
-from bs4 import BeautifulSoup
 from ..core.page import Page
 
 logger = logging.getLogger(__name__)
 
-class DOMManager:
-    def __init__(self, page: Page):
-        self.page = page
-        self._element_cache = {}
-        self._last_url = None
-        self.dom_cache: Dict[str, Any] = {}
-        self.element_cache: Dict[str, Dict[str, Any]] = {}
-        self.last_interaction_map: Dict[str, str] = {}
-        self.highlight_style = """
-            /* Reset any site-specific styles that might interfere */
-            .nazare-enabled [data-nazare-interactive] {
-                all: initial !important;
-                position: relative !important;
-                cursor: pointer !important;
-                display: inline-block !important;
+_STATIC_DIR = Path(__file__).parent.parent / "static"
+
+# Maximum number of URLs kept in the per-URL caches before the oldest is evicted
+MAX_CACHED_URLS = 32
+
+# Highlight styles injected into every annotated page
+_HIGHLIGHT_STYLE = """
+    /* Reset any site-specific styles that might interfere */
+    .nazare-enabled [data-nazare-interactive] {
+        all: initial !important;
+        position: relative !important;
+        cursor: pointer !important;
+        display: inline-block !important;
+    }
+    
+    /* Highlight styles */
+    .nazare-enabled [data-nazare-interactive]::after {
+        content: '';
+        position: absolute;
+        top: 0;
+        left: 0;
+        right: 0;
+        bottom: 0;
+        outline: 2px solid rgba(0, 123, 255, 0.5);
+        outline-offset: 2px;
+        pointer-events: none;
+        z-index: 999999;
+        opacity: 0;
+        transition: opacity 0.2s;
+    }
+    
+    .nazare-enabled [data-nazare-interactive]:hover::after {
+        opacity: 1;
+    }
+    
+    /* Type indicators */
+    .nazare-enabled [data-nazare-type]::before {
+        content: attr(data-nazare-type);
+        position: absolute;
+        top: -20px;
+        left: 50%;
+        transform: translateX(-50%);
+        background: rgba(0, 0, 0, 0.8);
+        color: white;
+        padding: 2px 6px;
+        border-radius: 4px;
+        font-size: 10px;
+        opacity: 0;
+        pointer-events: none;
+        z-index: 1000000;
+        transition: opacity 0.2s;
+    }
+    
+    .nazare-enabled [data-nazare-interactive]:hover::before {
+        opacity: 1;
+    }
+"""
+
+# Semantic annotation helpers, shared by inject_dom_utilities and the init script
+_DOM_UTILS_JS = """() => {
+    if (window.DOMUtils) return;
+    
+    window.DOMUtils = {
+        // Versioned so get_interactive_elements can tell when its last scan
+        // may be stale; the epoch changes with every new document
+        _iaEpoch: Math.random().toString(36).slice(2),
+        _iaVersion: 0,
+        
+        watchVersion() {
+            // Bump the version on any change that can alter the interactive
+            // element scan: nodes, text, and the attributes it reads
+            if (this._versionObserver || !document.body) return;
+            this._versionObserver = new MutationObserver(() => { this._iaVersion++; });
+            this._versionObserver.observe(document.body, {
+                childList: true,
+                subtree: true,
+                characterData: true,
+                attributes: true,
+                attributeFilter: [
+                    'class', 'style', 'hidden', 'aria-hidden',
+                    'data-nazare-role', 'data-nazare-type', 'data-nazare-text', 'data-nazare-visible'
+                ]
+            });
+        },
+        
+        getElementContext(element) {
+            if (!element || element.nodeType !== Node.ELEMENT_NODE) return null;
+            
+            const desc = this.describeElement(element);
+            
+            // Get computed role and type
+            const role = this.computeAriaRole(desc);
+            const type = this.determineSemanticType(desc);
+            
+            // Get text content with enhanced extraction
+            const text = this.extractElementText(desc);
+            
+            // Check visibility with improved detection
+            const isVisible = this.isElementVisible(element);
+            
+            return { role, type, text, isVisible };
+        },
+        
+        describeElement(element) {
+            // Plain-object snapshot of everything the classifiers need, so
+            // they can run off the main thread
+            const desc = {
+                tag: element.tagName.toLowerCase(),
+                id: element.id,
+                role: element.getAttribute('role'),
+                type: element.getAttribute('type'),
+                hasHref: element.hasAttribute('href'),
+                classes: Array.from(element.classList),
+                ariaLabel: element.getAttribute('aria-label'),
+                placeholder: element.getAttribute('placeholder'),
+                value: '',
+                textRaw: ''
+            };
+            if (desc.tag === 'input') {
+                desc.value = element.value;
             }
+            if (!desc.ariaLabel && !desc.placeholder && !desc.value) {
+                // Capped so containers don't clone the whole page text into
+                // every worker message
+                desc.textRaw = (element.textContent || '').trim().slice(0, 200);
+            }
+            return desc;
+        },
+        
+        computeAriaRole(desc) {
+            const explicitRole = desc.role;
+            if (explicitRole) return explicitRole;
+            
+            const tag = desc.tag;
+            const type = desc.type;
+            
+            // Compute implicit role based on element characteristics
+            if (tag === 'button' || type === 'button') return 'button';
+            if (tag === 'a' && desc.hasHref) return 'link';
+            if (tag === 'input') {
+                if (type === 'text' || type === 'search') return 'textbox';
+                if (type === 'checkbox') return 'checkbox';
+                if (type === 'radio') return 'radio';
+                return type || 'textbox';
+            }
+            if (tag === 'select') return 'combobox';
+            if (tag === 'textarea') return 'textbox';
+            if (tag.match(/^h[1-6]$/)) return 'heading';
+            
+            return 'generic';
+        },
+        
+        determineSemanticType(desc) {
+            const tag = desc.tag;
+            const role = desc.role;
+            const type = desc.type;
+            
+            // Enhanced type detection for YouTube
+            if (desc.id === 'search') return 'searchbox';
+            if (desc.id === 'search-icon-legacy') return 'button';
+            if (desc.id === 'video-title-link') return 'link';
+            if (desc.classes.includes('ytp-play-button')) return 'button';
+            if (desc.classes.includes('ytp-settings-button')) return 'button';
+            
+            // General semantic types
+            if (tag === 'button' || role === 'button') return 'button';
+            if (tag === 'a' || role === 'link') return 'link';
+            if (tag === 'input') {
+                if (type === 'text') return 'textbox';
+                if (type === 'search') return 'searchbox';
+                if (type === 'checkbox') return 'checkbox';
+                if (type === 'radio') return 'radio';
+                return type;
+            }
+            if (tag === 'select') return 'dropdown';
+            if (role === 'navigation') return 'navigation';
+            if (role === 'main') return 'main-content';
+            if (role === 'complementary') return 'sidebar';
+            if (tag.match(/^h[1-6]$/)) return 'heading';
+            
+            return 'generic';
+        },
+        
+        extractElementText(desc) {
+            // Try aria-label first, then placeholder, then value for inputs
+            if (desc.ariaLabel) return desc.ariaLabel;
+            if (desc.placeholder) return desc.placeholder;
+            if (desc.value) return desc.value;
+            
+            // Finally try text content
+            return desc.textRaw ? desc.textRaw.trim() : '';
+        },
+        
+        isElementVisible(element) {
+            // Attribute checks first so hidden elements never force layout or style recalc
+            if (!element || element.hasAttribute('hidden') || element.hasAttribute('aria-hidden')) return false;
+            
+            const rect = element.getBoundingClientRect();
+            if (!rect.width || !rect.height) return false;
+            
+            const style = window.getComputedStyle(element);
+            return (
+                style.visibility !== 'hidden' && 
+                style.display !== 'none' &&
+                style.opacity !== '0'
+            );
+        },
+        
+        preAnnotateElement(element) {
+            if (!element || element.nodeType !== Node.ELEMENT_NODE) return;
+            
+            const context = this.getElementContext(element);
+            if (!context) return;
             
-            /* Highlight styles */
-            .nazare-enabled [data-nazare-interactive]::after {
-                content: '';
-                position: absolute;
-                top: 0;
-                left: 0;
-                right: 0;
-                bottom: 0;
-                outline: 2px solid rgba(0, 123, 255, 0.5);
-                outline-offset: 2px;
-                pointer-events: none;
-                z-index: 999999;
-                opacity: 0;
-                transition: opacity 0.2s;
+            this.applyContext(element, context);
+        },
+        
+        applyContext(element, context) {
+            // Generate a unique ID if needed
+            if (!element.id) {
+                element.id = `nazare-${Math.random().toString(36).substr(2, 9)}`;
             }
             
-            .nazare-enabled [data-nazare-interactive]:hover::after {
-                opacity: 1;
+            // Add data attributes
+            element.setAttribute('data-nazare-role', context.role);
+            element.setAttribute('data-nazare-type', context.type);
+            if (context.text) {
+                element.setAttribute('data-nazare-text', context.text);
             }
+            element.setAttribute('data-nazare-visible', context.isVisible.toString());
             
-            /* Type indicators */
-            .nazare-enabled [data-nazare-type]::before {
-                content: attr(data-nazare-type);
-                position: absolute;
-                top: -20px;
-                left: 50%;
-                transform: translateX(-50%);
-                background: rgba(0, 0, 0, 0.8);
-                color: white;
-                padding: 2px 6px;
-                border-radius: 4px;
-                font-size: 10px;
-                opacity: 0;
-                pointer-events: none;
-                z-index: 1000000;
-                transition: opacity 0.2s;
+            // Mark interactive elements
+            if (['button', 'link', 'textbox', 'searchbox', 'checkbox', 'radio', 'dropdown'].includes(context.type)) {
+                element.setAttribute('data-nazare-interactive', 'true');
             }
             
-            .nazare-enabled [data-nazare-interactive]:hover::before {
-                opacity: 1;
+            // Store element context
+            window.nazareElements = window.nazareElements || {};
+            window.nazareElements[element.id] = context;
+            this._iaVersion++;
+        },
+        
+        findElement(selector) {
+            // Try exact match first
+            let element = document.querySelector(selector);
+            if (element) return element;
+            
+            // Try data attributes with exact match
+            element = document.querySelector(`[data-nazare-text="${selector}"]`);
+            if (element) return element;
+            
+            // Try semantic search with partial match
+            const elements = document.querySelectorAll('[data-nazare-interactive]');
+            for (const el of elements) {
+                const text = el.getAttribute('data-nazare-text');
+                if (text && text.toLowerCase().includes(selector.toLowerCase())) {
+                    return el;
+                }
             }
-        """
+            
+            // Try role-based search
+            const role = selector.toLowerCase();
+            element = document.querySelector(`[data-nazare-role="${role}"]`);
+            if (element) return element;
+            
+            return null;
+        },
+        
+        yieldToMain() {
+            // Background priority lets input and rendering run between chunks
+            return new Promise(resolve => 'scheduler' in window
+                ? scheduler.postTask(resolve, {priority: 'background'})
+                : setTimeout(resolve, 0));
+        },
+        
+        getWorker() {
+            // One dedicated worker runs the side-effect-free classifiers;
+            // DOM reads and writes stay on the main thread
+            if (this._worker !== undefined) return this._worker;
+            
+            try {
+                const source = `
+                    const U = {${this.computeAriaRole}, ${this.determineSemanticType}, ${this.extractElementText}};
+                    onmessage = (e) => {
+                        const results = e.data.items.map(desc => ({
+                            role: U.computeAriaRole(desc),
+                            type: U.determineSemanticType(desc),
+                            text: U.extractElementText(desc)
+                        }));
+                        postMessage({ id: e.data.id, results });
+                    };
+                `;
+                const url = URL.createObjectURL(new Blob([source], { type: 'text/javascript' }));
+                this._worker = new Worker(url);
+                URL.revokeObjectURL(url);
+                this._pending = new Map();
+                this._nextBatchId = 0;
+                
+                this._worker.onmessage = (e) => {
+                    const batch = this._pending.get(e.data.id);
+                    if (batch) {
+                        this._pending.delete(e.data.id);
+                        batch.resolve(e.data.results);
+                    }
+                };
+                this._worker.onerror = (e) => {
+                    // Fall back to main-thread classification from now on
+                    this._pending.forEach(batch => batch.reject(e));
+                    this._pending.clear();
+                    this._worker = null;
+                };
+            } catch (e) {
+                // Blob workers can be blocked by CSP
+                this._worker = null;
+            }
+            return this._worker;
+        },
+        
+        classifyInWorker(descs) {
+            const worker = this.getWorker();
+            if (!worker) return Promise.resolve(null);
+            
+            return new Promise((resolve, reject) => {
+                const id = this._nextBatchId++;
+                this._pending.set(id, { resolve, reject });
+                worker.postMessage({ id, items: descs });
+            });
+        },
+        
+        async preAnnotateTree(root, chunkSize = 500) {
+            const elements = root.nodeType === Node.ELEMENT_NODE
+                ? [root, ...root.querySelectorAll('*')]
+                : [...root.querySelectorAll('*')];
+            
+            for (let i = 0; i < elements.length; i += chunkSize) {
+                const chunk = elements.slice(i, i + chunkSize);
+                
+                let classified = null;
+                try {
+                    classified = await this.classifyInWorker(chunk.map(el => this.describeElement(el)));
+                } catch (e) {
+                    console.warn('Worker classification failed, using main thread:', e);
+                }
+                
+                for (let j = 0; j < chunk.length; j++) {
+                    try {
+                        if (classified) {
+                            const context = classified[j];
+                            context.isVisible = this.isElementVisible(chunk[j]);
+                            this.applyContext(chunk[j], context);
+                        } else {
+                            this.preAnnotateElement(chunk[j]);
+                        }
+                    } catch (e) {
+                        console.error('Error pre-annotating element:', e);
+                    }
+                }
+                if (i + chunkSize < elements.length) {
+                    await this.yieldToMain();
+                }
+            }
+        },
+        
+        async preAnnotatePage() {
+            try {
+                await this.preAnnotateTree(document);
+                return window.nazareElements || {};
+            } catch (e) {
+                console.error('Error in preAnnotatePage:', e);
+                return {};
+            }
+        }
+    };
+    
+    // Expose utilities globally
+    window.preAnnotateElement = window.DOMUtils.preAnnotateElement.bind(window.DOMUtils);
+    window.findElement = window.DOMUtils.findElement.bind(window.DOMUtils);
+}"""
+
+@dataclass(slots=True)
+class CachedElement:
+    """Cached snapshot of a single element."""
+    tag: str
+    attributes: Dict[str, Any]
+    text: str
+    is_visible: bool
+    rect: Tuple[float, ...]
+    path: str
+
+
+class DOMManager:
+    def __init__(self, page: Page):
+        self.page = page
+        self._element_cache = {}
+        self._last_url = None
+        self.dom_cache: Dict[str, Any] = {}
+        self.element_cache: OrderedDict[str, Dict[str, CachedElement]] = OrderedDict()
+        self.last_interaction_map: Dict[str, str] = {}
+        self._init_script_installed = False
+        self._last_ia_version: Optional[str] = None
+        self._last_ia_result: List[Dict[str, Any]] = []
         
     async def inject_styles(self):
         """Inject the highlight styles into the page"""
         try:
             # Add style tag directly
-            await self.page.add_style_tag(content=self.highlight_style)
+            await self.page.add_style_tag(content=_HIGHLIGHT_STYLE)
             
             # Add nazare-enabled class to body
             await self.page.evaluate("""
@@ -85,25 +428,56 @@ class DOMManager:
             logger.error(f"Error injecting styles: {str(e)}")
             raise
 
+    def _build_init_script(self) -> str:
+        """Bundle styles, DOM utilities and pre-annotation into a single script."""
+        with open(_STATIC_DIR / "dom-utils.js") as f:
+            dom_utils_script = f.read()
+        
+        return f"""(() => {{
+            // add_init_script runs in every frame; only the top document needs the tooling
+            if (window !== window.top) return;
+            {dom_utils_script}
+            ({_DOM_UTILS_JS})();
+            window.NazareDOM._hlEl = window.NazareDOM._hlEl || null;
+            (() => {{
+                const onReady = () => {{
+                    if (window.DOMUtils._ready) return;
+                    window.DOMUtils._ready = true;
+                    (document.head || document.documentElement).appendChild(
+                        Object.assign(document.createElement('style'), {{textContent: {json.dumps(_HIGHLIGHT_STYLE)}}})
+                    );
+                    document.body.classList.add('nazare-enabled');
+                    window.DOMUtils.watchVersion();
+                    // Kept so Python can wait for the chunked walk to finish
+                    window.DOMUtils._annotated = window.DOMUtils.preAnnotatePage();
+                }};
+                if (document.readyState === 'loading') {{
+                    document.addEventListener('DOMContentLoaded', onReady, {{once: true}});
+                }} else {{
+                    onReady();
+                }}
+            }})();
+        }})();
+        """
+
     async def setup_page(self):
         """Initialize page with DOM utilities."""
         try:
-            # Wait for page to be ready
-            await self.page.wait_for_load_state("domcontentloaded")
-            
-            # Load DOM utilities script
-            script_path = Path(__file__).parent.parent / "static" / "dom-utils.js"
-            with open(script_path) as f:
-                dom_utils_script = f.read()
-            
-            # Add script tag directly
-            await self.page.add_script_tag(content=dom_utils_script)
-            
-            # Wait for utilities to be available
-            await self.page.wait_for_function('!!window.NazareDOM', timeout=5000)
+            if not self._init_script_installed:
+                script = self._build_init_script()
+                
+                # Runs on every subsequent navigation, so the whole setup costs
+                # one round-trip instead of one per injection step
+                await self.page.add_init_script(script)
+                # Registered now even if the evaluate below fails, so it must
+                # never be added twice
+                self._init_script_installed = True
+                
+                # The current document predates the init script
+                await self.page.evaluate(script)
             
-            # Initialize annotations
-            await self.page.evaluate('window.NazareDOM.init()')
+            await self.page.wait_for_load_state("domcontentloaded")
+            await self._wait_for_annotations()
             
             logger.info("Page setup completed successfully")
             
@@ -111,181 +485,17 @@ class DOMManager:
             logger.error(f"Error setting up page: {str(e)}")
             raise
 
+    async def _wait_for_annotations(self):
+        """Wait for the init script's pre-annotation walk to finish."""
+        await self.page.evaluate("""async () => {
+            if (window.DOMUtils && window.DOMUtils._annotated) {
+                await window.DOMUtils._annotated;
+            }
+        }""")
+
     async def inject_dom_utilities(self):
         """Inject enhanced DOM utilities."""
-        await self.page.evaluate("""() => {
-            if (window.DOMUtils) return;
-            
-            window.DOMUtils = {
-                getElementContext(element) {
-                    if (!element || element.nodeType !== Node.ELEMENT_NODE) return null;
-                    
-                    // Get computed role and type
-                    const role = this.computeAriaRole(element);
-                    const type = this.determineSemanticType(element);
-                    
-                    // Get text content with enhanced extraction
-                    const text = this.extractElementText(element);
-                    
-                    // Check visibility with improved detection
-                    const isVisible = this.isElementVisible(element);
-                    
-                    return { role, type, text, isVisible };
-                },
-                
-                computeAriaRole(element) {
-                    const explicitRole = element.getAttribute('role');
-                    if (explicitRole) return explicitRole;
-                    
-                    const tag = element.tagName.toLowerCase();
-                    const type = element.getAttribute('type');
-                    
-                    // Compute implicit role based on element characteristics
-                    if (tag === 'button' || type === 'button') return 'button';
-                    if (tag === 'a' && element.hasAttribute('href')) return 'link';
-                    if (tag === 'input') {
-                        if (type === 'text' || type === 'search') return 'textbox';
-                        if (type === 'checkbox') return 'checkbox';
-                        if (type === 'radio') return 'radio';
-                        return type || 'textbox';
-                    }
-                    if (tag === 'select') return 'combobox';
-                    if (tag === 'textarea') return 'textbox';
-                    if (tag.match(/^h[1-6]$/)) return 'heading';
-                    
-                    return 'generic';
-                },
-                
-                determineSemanticType(element) {
-                    const tag = element.tagName.toLowerCase();
-                    const role = element.getAttribute('role');
-                    const type = element.getAttribute('type');
-                    
-                    // Enhanced type detection for YouTube
-                    if (element.id === 'search') return 'searchbox';
-                    if (element.id === 'search-icon-legacy') return 'button';
-                    if (element.id === 'video-title-link') return 'link';
-                    if (element.classList.contains('ytp-play-button')) return 'button';
-                    if (element.classList.contains('ytp-settings-button')) return 'button';
-                    
-                    // General semantic types
-                    if (tag === 'button' || role === 'button') return 'button';
-                    if (tag === 'a' || role === 'link') return 'link';
-                    if (tag === 'input') {
-                        if (type === 'text') return 'textbox';
-                        if (type === 'search') return 'searchbox';
-                        if (type === 'checkbox') return 'checkbox';
-                        if (type === 'radio') return 'radio';
-                        return type;
-                    }
-                    if (tag === 'select') return 'dropdown';
-                    if (role === 'navigation') return 'navigation';
-                    if (role === 'main') return 'main-content';
-                    if (role === 'complementary') return 'sidebar';
-                    if (tag.match(/^h[1-6]$/)) return 'heading';
-                    
-                    return 'generic';
-                },
-                
-                extractElementText(element) {
-                    // Try aria-label first
-                    let text = element.getAttribute('aria-label');
-                    if (text) return text;
-                    
-                    // Then try placeholder
-                    text = element.getAttribute('placeholder');
-                    if (text) return text;
-                    
-                    // Then try value for inputs
-                    if (element.tagName.toLowerCase() === 'input') {
-                        text = element.value;
-                        if (text) return text;
-                    }
-                    
-                    // Finally try text content
-                    text = element.textContent;
-                    if (text) return text.trim();
-                    
-                    return '';
-                },
-                
-                isElementVisible(element) {
-                    if (!element) return false;
-                    
-                    const style = window.getComputedStyle(element);
-                    const rect = element.getBoundingClientRect();
-                    
-                    return !!(
-                        rect.width && 
-                        rect.height && 
-                        style.visibility !== 'hidden' && 
-                        style.display !== 'none' &&
-                        style.opacity !== '0' &&
-                        !element.hasAttribute('hidden') &&
-                        !element.hasAttribute('aria-hidden')
-                    );
-                },
-                
-                preAnnotateElement(element) {
-                    if (!element || element.nodeType !== Node.ELEMENT_NODE) return;
-                    
-                    const context = this.getElementContext(element);
-                    if (!context) return;
-                    
-                    // Generate a unique ID if needed
-                    if (!element.id) {
-                        element.id = `nazare-${Math.random().toString(36).substr(2, 9)}`;
-                    }
-                    
-                    // Add data attributes
-                    element.setAttribute('data-nazare-role', context.role);
-                    element.setAttribute('data-nazare-type', context.type);
-                    if (context.text) {
-                        element.setAttribute('data-nazare-text', context.text);
-                    }
-                    element.setAttribute('data-nazare-visible', context.isVisible.toString());
-                    
-                    // Mark interactive elements
-                    if (['button', 'link', 'textbox', 'searchbox', 'checkbox', 'radio', 'dropdown'].includes(context.type)) {
-                        element.setAttribute('data-nazare-interactive', 'true');
-                    }
-                    
-                    // Store element context
-                    window.nazareElements = window.nazareElements || {};
-                    window.nazareElements[element.id] = context;
-                },
-                
-                findElement(selector) {
-                    // Try exact match first
-                    let element = document.querySelector(selector);
-                    if (element) return element;
-                    
-                    // Try data attributes with exact match
-                    element = document.querySelector(`[data-nazare-text="${selector}"]`);
-                    if (element) return element;
-                    
-                    // Try semantic search with partial match
-                    const elements = document.querySelectorAll('[data-nazare-interactive]');
-                    for (const el of elements) {
-                        const text = el.getAttribute('data-nazare-text');
-                        if (text && text.toLowerCase().includes(selector.toLowerCase())) {
-                            return el;
-                        }
-                    }
-                    
-                    // Try role-based search
-                    const role = selector.toLowerCase();
-                    element = document.querySelector(`[data-nazare-role="${role}"]`);
-                    if (element) return element;
-                    
-                    return null;
-                }
-            };
-            
-            // Expose utilities globally
-            window.preAnnotateElement = window.DOMUtils.preAnnotateElement.bind(window.DOMUtils);
-            window.findElement = window.DOMUtils.findElement.bind(window.DOMUtils);
-        }""")
+        await self.page.evaluate(_DOM_UTILS_JS)
 
     async def pre_annotate_page(self):
         """Pre-annotate all elements on the page."""
@@ -295,24 +505,7 @@ class DOMManager:
                 return {};
             }
             
-            try {
-                // First annotate the body
-                window.DOMUtils.preAnnotateElement(document.body);
-                
-                // Then annotate all elements
-                document.querySelectorAll('*').forEach(el => {
-                    try {
-                        window.DOMUtils.preAnnotateElement(el);
-                    } catch (e) {
-                        console.error('Error pre-annotating element:', e);
-                    }
-                });
-                
-                return window.nazareElements || {};
-            } catch (e) {
-                console.error('Error in pre_annotate_page:', e);
-                return {};
-            }
+            return window.DOMUtils.preAnnotatePage();
         }""")
 
     async def setup_observers(self):
@@ -323,25 +516,23 @@ class DOMManager:
                 return;
             }
             
+            // Invalidates get_interactive_elements' cached scan
+            window.DOMUtils.watchVersion();
+            
             // Create observer for dynamic content
             window.domObserver = new MutationObserver((mutations) => {
+                window.DOMUtils._iaVersion++;
                 mutations.forEach(mutation => {
                     if (mutation.type === 'childList') {
                         mutation.addedNodes.forEach(node => {
                             if (node.nodeType === Node.ELEMENT_NODE) {
-                                try {
-                                    window.DOMUtils.preAnnotateElement(node);
-                                    // Also pre-annotate all children
-                                    node.querySelectorAll('*').forEach(el => {
-                                        try {
-                                            window.DOMUtils.preAnnotateElement(el);
-                                        } catch (e) {
-                                            console.error('Error pre-annotating child element:', e);
-                                        }
-                                    });
-                                } catch (e) {
+                                // Bump again once the async annotation has landed, so a
+                                // snapshot taken in between is not reused afterwards
+                                window.DOMUtils.preAnnotateTree(node).then(() => {
+                                    window.DOMUtils._iaVersion++;
+                                }, e => {
                                     console.error('Error pre-annotating element:', e);
-                                }
+                                });
                             }
                         });
                     }
@@ -352,7 +543,7 @@ class DOMManager:
             window.domObserver.observe(document.body, {
                 childList: true,
                 subtree: true,
-                attributes: false  // We don't need to watch attributes
+                attributes: false  // Attribute changes only matter to watchVersion
             });
         }""")
 
@@ -360,16 +551,16 @@ class DOMManager:
         """Find an element using enhanced element finding."""
         try:
             # First try using NazareDOM's findElement
-            found_element = await self.page.evaluate(f"""
-                () => {{
-                    const el = window.NazareDOM.findElement("{selector}");
-                    if (el) {{
-                        el.scrollIntoView({{behavior: 'smooth', block: 'center'}});
+            found_element = await self.page.evaluate("""
+                (selector) => {
+                    const el = window.NazareDOM.findElement(selector);
+                    if (el) {
+                        el.scrollIntoView({behavior: 'smooth', block: 'center'});
                         return el.id;
-                    }}
+                    }
                     return null;
-                }}
-            """)
+                }
+            """, selector)
             
             if found_element:
                 return await self.page.query_selector(f"#{found_element}")
@@ -427,27 +618,42 @@ class DOMManager:
             key += f".{'.'.join(node['classes'])}"
             
         # Cache element data
-        self.element_cache[url] = self.element_cache.get(url, {})
-        self.element_cache[url][key] = {
-            'tag': node['tag'],
-            'attributes': node.get('attributes', {}),
-            'text': node.get('text', ''),
-            'isVisible': node.get('isVisible', False),
-            'rect': node.get('rect', {}),
-            'path': path
-        }
+        if url not in self.element_cache:
+            self.element_cache[url] = {}
+            self._evict_oldest(self.element_cache)
+        self.element_cache.move_to_end(url)
+        rect = node.get('rect', {})
+        if isinstance(rect, dict):
+            rect = (rect.get('x', 0), rect.get('y', 0), rect.get('width', 0), rect.get('height', 0))
+        self.element_cache[url][key] = CachedElement(
+            tag=node['tag'],
+            attributes=node.get('attributes', {}),
+            text=node.get('text', ''),
+            is_visible=node.get('isVisible', False),
+            rect=tuple(rect),
+            path=path
+        )
         
         # Process children
         for i, child in enumerate(node.get('children', [])):
             child_path = f"{path}/{i}" if path else str(i)
             self._build_element_cache(child, url, child_path)
 
+    @staticmethod
+    def _evict_oldest(cache: OrderedDict):
+        """Drop least recently used URLs until the cache is within bounds."""
+        while len(cache) > MAX_CACHED_URLS:
+            cache.popitem(last=False)
+
     def clear_cache(self, url: Optional[str] = None):
         """Clear element cache for a specific URL or all URLs."""
+        caches = (self._element_cache, self.dom_cache, self.element_cache, self.last_interaction_map)
         if url:
-            self._element_cache.pop(url, None)
+            for cache in caches:
+                cache.pop(url, None)
         else:
-            self._element_cache.clear()
+            for cache in caches:
+                cache.clear()
 
     async def highlight_element(self, element_handle: ElementHandle, highlight_type: str = 'default'):
         """
@@ -458,10 +664,11 @@ class DOMManager:
             return
             
         await self.page.evaluate("""(element, type) => {
-            // Remove existing highlights
-            document.querySelectorAll('.nazare-highlight').forEach(el => {
-                el.classList.remove('nazare-highlight', 'nazare-highlight-active', 'nazare-highlight-error');
-            });
+            // Remove the previous highlight
+            const prev = window.NazareDOM._hlEl;
+            if (prev) {
+                prev.classList.remove('nazare-highlight', 'nazare-highlight-active', 'nazare-highlight-error');
+            }
             
             // Add new highlight
             element.classList.add('nazare-highlight');
@@ -470,6 +677,7 @@ class DOMManager:
             } else if (type === 'error') {
                 element.classList.add('nazare-highlight-error');
             }
+            window.NazareDOM._hlEl = element;
             
             // Scroll element into view if needed
             const rect = element.getBoundingClientRect();
@@ -495,20 +703,45 @@ class DOMManager:
         }""", element_handle, highlight_type)
 
     async def get_interactive_elements(self) -> List[Dict[str, Any]]:
-        """Get all interactive elements on the page."""
+        """Get all interactive elements on the page.
+        
+        The previous result is reused while the page's version watcher has
+        seen no DOM, text or relevant attribute changes. Scrolling and
+        resizing alone don't invalidate it, so ``isVisible`` can lag behind
+        the viewport until the next change.
+        """
         try:
-            return await self.page.evaluate("""
-                () => {
+            # Version check and scan share one round-trip
+            result = await self.page.evaluate("""
+                (lastVersion) => {
+                    const utils = window.DOMUtils;
+                    const version = utils && utils._versionObserver
+                        ? `${utils._iaEpoch}:${utils._iaVersion}`
+                        : null;
+                    if (version !== null && version === lastVersion) {
+                        return { version, unchanged: true };
+                    }
+                    
                     const elements = document.querySelectorAll('.nazare-interactive');
-                    return Array.from(elements).map(el => ({
-                        id: el.id,
-                        type: el.getAttribute('data-nazare-type'),
-                        role: el.getAttribute('data-nazare-role') || el.getAttribute('role'),
-                        text: el.getAttribute('data-nazare-text') || el.textContent.trim(),
-                        isVisible: window.NazareDOM.checkVisibility(el)
-                    }));
+                    return {
+                        version,
+                        elements: Array.from(elements).map(el => ({
+                            id: el.id,
+                            type: el.getAttribute('data-nazare-type'),
+                            role: el.getAttribute('data-nazare-role') || el.getAttribute('role'),
+                            text: el.getAttribute('data-nazare-text') || el.textContent.trim(),
+                            isVisible: window.NazareDOM.checkVisibility(el)
+                        }))
+                    };
                 }
-            """)
+            """, self._last_ia_version)
+            
+            if result.get('unchanged'):
+                return self._last_ia_result
+            
+            self._last_ia_version = result['version']
+            self._last_ia_result = result['elements']
+            return self._last_ia_result
         except Exception as e:
             logger.error(f"Error getting interactive elements: {str(e)}")
             return []
@@ -519,20 +752,14 @@ class DOMManager:
             # Wait for initial load
             await self.page.wait_for_load_state("domcontentloaded", timeout=timeout)
             
-            # Re-inject and initialize DOM utilities
-            script_path = Path(__file__).parent.parent / "static" / "dom-utils.js"
-            with open(script_path) as f:
-                dom_utils_script = f.read()
-            
-            # Add script tag directly
-            await self.page.add_script_tag(content=dom_utils_script)
-            
-            # Wait for utilities to be available and initialize
-            await self.page.wait_for_function('!!window.NazareDOM', timeout=5000)
-            await self.page.evaluate('window.NazareDOM.init()')
+            # DOM utilities are re-created by the init script on every navigation
+            if not self._init_script_installed:
+                await self.setup_page()
+            else:
+                await self._wait_for_annotations()
             
             logger.info("DOM utilities reinitialized after navigation")
             
         except Exception as e:
             logger.error(f"Error waiting for navigation: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
@@ -1,17 +1,20 @@
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Literal, Optional, Union, Tuple, Set
 import os
+import openai
 from openai import AsyncOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field, ValidationError
+import httpx
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
 import json
+import re
+from urllib.parse import quote_plus, urlsplit
+import orjson
 import logging
 import asyncio
 from functools import wraps
+from collections import OrderedDict, deque
+import time
 from datetime import datetime, timedelta
-import hashlib
-import aiofiles
-import aiofiles.os
+import xxhash
 from pathlib import Path
 import tenacity
 from ..exceptions import LLMError, LLMResponseError, LLMAPIError
@@ -21,9 +24,14 @@ from ..core.page import Page
 logger = logging.getLogger(__name__)
 
 class ResponseCache:
-    def __init__(self, cache_dir: str = ".cache/llm", ttl_minutes: int = 60):
+    def __init__(self, cache_dir: str = ".cache/llm", ttl_minutes: int = 60, max_memory_entries: int = 512):
         self.cache_dir = Path(cache_dir)
         self.ttl = timedelta(minutes=ttl_minutes)
+        self.max_memory_entries = max_memory_entries
+        # In-process LRU in front of the disk cache: key -> (timestamp, response)
+        self._mem: OrderedDict[str, Tuple[datetime, str]] = OrderedDict()
+        self._mem_lock = asyncio.Lock()
+        self._pending_writes: Set[asyncio.Task] = set()
         self._ensure_cache_dir()
     
     def _ensure_cache_dir(self):
@@ -31,59 +39,111 @@ class ResponseCache:
         self.cache_dir.mkdir(parents=True, exist_ok=True)
     
     def _get_cache_key(self, prompt: str) -> str:
-        """Generate a cache key from the prompt."""
-        return hashlib.sha256(prompt.encode()).hexdigest()
+        """Generate a cache key from the prompt.
+        
+        Keys only need to be collision-resistant, not cryptographic. The
+        prefix keeps old SHA-256 named entries from being picked up.
+        """
+        return f"xxh3-{xxhash.xxh3_128_hexdigest(prompt)}"
     
     def _get_cache_path(self, key: str) -> Path:
         """Get the cache file path for a key."""
         return self.cache_dir / f"{key}.json"
     
-    async def get(self, prompt: str) -> Optional[str]:
-        """Get cached response if it exists and is not expired."""
+    async def _remember(self, key: str, timestamp: datetime, response: str):
+        """Store a response in the in-memory LRU, evicting the oldest entries."""
+        async with self._mem_lock:
+            self._mem[key] = (timestamp, response)
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_memory_entries:
+                self._mem.popitem(last=False)
+    
+    async def get(self, prompt: str, key: Optional[str] = None) -> Optional[str]:
+        """Get cached response if it exists and is not expired.
+        
+        ``key`` may be passed to reuse a key already computed by the caller.
+        """
         try:
-            key = self._get_cache_key(prompt)
+            key = key or self._get_cache_key(prompt)
+            
+            async with self._mem_lock:
+                entry = self._mem.get(key)
+                if entry is not None:
+                    if datetime.now() - entry[0] <= self.ttl:
+                        self._mem.move_to_end(key)
+                        return entry[1]
+                    del self._mem[key]
+            
             cache_path = self._get_cache_path(key)
             
-            if not cache_path.exists():
+            # Cache files are tiny, so one thread hop per operation is enough
+            try:
+                data = orjson.loads(await asyncio.to_thread(cache_path.read_bytes))
+            except FileNotFoundError:
                 return None
                 
-            async with aiofiles.open(cache_path, 'r') as f:
-                data = json.loads(await f.read())
-                
             cached_time = datetime.fromisoformat(data['timestamp'])
             if datetime.now() - cached_time > self.ttl:
-                await aiofiles.os.remove(cache_path)
+                await asyncio.to_thread(cache_path.unlink, missing_ok=True)
                 return None
-                
+            
+            await self._remember(key, cached_time, data['response'])
             return data['response']
         except Exception as e:
             logger.warning(f"Cache read error: {str(e)}")
             return None
     
-    async def set(self, prompt: str, response: str):
-        """Cache a response."""
+    async def set(self, prompt: str, response: str, key: Optional[str] = None):
+        """Cache a response.
+        
+        The in-memory entry is updated immediately; the disk write runs in
+        the background so callers don't wait on file I/O.
+        """
         try:
-            key = self._get_cache_key(prompt)
-            cache_path = self._get_cache_path(key)
+            key = key or self._get_cache_key(prompt)
+            now = datetime.now()
+            await self._remember(key, now, response)
             
             data = {
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': now.isoformat(),
                 'response': response
             }
             
-            async with aiofiles.open(cache_path, 'w') as f:
-                await f.write(json.dumps(data))
+            task = asyncio.create_task(self._write(self._get_cache_path(key), data))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+        except Exception as e:
+            logger.warning(f"Cache write error: {str(e)}")
+    
+    async def _write(self, cache_path: Path, data: Dict[str, Any]):
+        """Persist a cache entry to disk."""
+        try:
+            await asyncio.to_thread(cache_path.write_bytes, orjson.dumps(data))
         except Exception as e:
             logger.warning(f"Cache write error: {str(e)}")
 
 class BrowserAction(BaseModel):
     """Model for browser actions with enhanced validation."""
-    type: str = Field(description="Type of action to perform (navigate, click, type, extract)")
-    selector: str = Field(description="CSS selector or text description of the target element")
-    value: str = Field(description="Value to use for the action (URL for navigate, text for type)")
+    model_config = ConfigDict(frozen=True, extra='ignore')
+    
+    type: Literal["navigate", "click", "type", "extract"] = Field(description="Type of action to perform (navigate, click, type, extract)")
+    selector: str = Field(description="CSS selector or text description of the target element", default="")
+    value: str = Field(description="Value to use for the action (URL for navigate, text for type)", default="")
     wait_for: str = Field(description="Element or condition to wait for after action", default="")
     press_enter: bool = Field(description="Whether to press Enter after typing (for type action)", default=False)
     
+    @field_validator("selector", "value", "wait_for", mode="before")
+    @classmethod
+    def _none_to_empty(cls, v: Any) -> Any:
+        """The LLM often sends null for unused fields; treat it as empty."""
+        return "" if v is None else v
+    
+    @field_validator("press_enter", mode="before")
+    @classmethod
+    def _none_to_false(cls, v: Any) -> Any:
+        """Treat a null press_enter as False."""
+        return False if v is None else v
+    
     @property
     def is_valid(self) -> bool:
         """Validate action based on type."""
@@ -97,6 +157,8 @@ class BrowserAction(BaseModel):
 
 class ActionPlan(BaseModel):
     """Model for action plans with enhanced validation."""
+    model_config = ConfigDict(frozen=True, extra='ignore')
+    
     url: str = Field(description="Target URL for the action")
     actions: List[BrowserAction] = Field(description="List of actions to perform")
     extraction: Dict[str, Any] = Field(description="Data to extract after actions", default_factory=dict)
@@ -108,6 +170,135 @@ class ActionPlan(BaseModel):
             return False
         return all(action.is_valid for action in self.actions)
 
+_SYSTEM_PROMPT_TEMPLATE = """You are an AI browser automation expert. Given a command and the current page state,
+generate a structured plan of actions to accomplish the task.
+
+Return ONLY a valid JSON object with this exact structure:
+{{
+    "url": "https://example.com",  // Target URL (must start with http:// or https://)
+    "actions": [  // List of actions to perform
+        {{
+            "type": "navigate",  // One of: navigate, click, type, extract
+            "value": "https://example.com",  // URL for navigate, text for type
+            "selector": "",  // CSS selector or element description
+            "wait_for": "",  // Optional: Element to wait for after action
+            "press_enter": false  // Optional: Whether to press Enter after typing
+        }}
+    ],
+    "extraction": {{}}  // Optional: Data to extract after actions
+}}
+
+For YouTube tasks, use these reliable selectors:
+- Search box: "input#search"
+- Search button: "button#search-icon-legacy"
+- Video links: "a#video-title-link"
+- Video player: "#movie_player video"
+- Play button: ".ytp-play-button"
+- Pause button: ".ytp-pause-button"
+- Volume button: ".ytp-mute-button"
+- Settings button: ".ytp-settings-button"
+- Full screen button: ".ytp-fullscreen-button"
+
+Return JSON matching: {schema}
+
+Return ONLY the JSON object, no additional text or explanation."""
+
+# Built once at import and shared by every controller. The compact schema
+# replaces langchain's much wordier format instructions.
+_ACTION_PLAN_ADAPTER = TypeAdapter(ActionPlan)
+_SCHEMA_JSON = orjson.dumps(ActionPlan.model_json_schema()).decode()
+_STATIC_PROMPT_HEAD = _SYSTEM_PROMPT_TEMPLATE.format(schema=_SCHEMA_JSON)
+
+# Used to pull the first JSON object out of free-form LLM output
+_DECODER = json.JSONDecoder()
+
+# Commands simple enough to plan without the LLM (see LLMController._fast_plan)
+_URL_RE = re.compile(r'^https?://\S+$', re.IGNORECASE)
+_NAVIGATE_RE = re.compile(r'^(?:open|go to|navigate to|visit)\s+(\S+\.\S+)$', re.IGNORECASE)
+# Hostname with an alphabetic TLD; targets ending in a file extension go to the LLM
+_HOSTNAME_RE = re.compile(r'^(?:[a-z0-9-]+\.)+([a-z]{2,})$')
+_FILE_EXTENSIONS = frozenset({
+    "pdf", "txt", "doc", "docx", "xls", "xlsx", "csv", "json", "xml",
+    "png", "jpg", "jpeg", "gif", "zip", "html", "htm", "py", "js", "md",
+})
+_SEARCH_RE = re.compile(r'^search (youtube|google) for (.+)$', re.IGNORECASE)
+# Queries that chain further steps ("... and play the first video") need the LLM
+_FOLLOW_UP_RE = re.compile(
+    r'[,;]|\b(?:and|then|after|click|play|watch|open|select|type|press|scroll|extract)\b',
+    re.IGNORECASE
+)
+_SEARCH_URLS = {
+    "youtube": "https://www.youtube.com/results?search_query={}",
+    "google": "https://www.google.com/search?q={}",
+}
+
+# Projects pre-annotated, visible interactive elements; the selector does the filtering
+_INTERACTIVE_ELEMENTS_JS = """
+() => {
+    const elements = document.querySelectorAll('[data-nazare-interactive][data-nazare-visible="true"]');
+    const result = new Array(elements.length);
+    for (let i = 0; i < elements.length; i++) {
+        const el = elements[i];
+        result[i] = {
+            id: el.id,
+            type: el.getAttribute('data-nazare-type'),
+            role: el.getAttribute('data-nazare-role'),
+            text: el.getAttribute('data-nazare-text'),
+            isVisible: true
+        };
+    }
+    return result;
+}
+"""
+_PAGE_SNAPSHOT_JS = f"() => ({{ url: location.href, elements: ({_INTERACTIVE_ELEMENTS_JS})() }})"
+
+# Shared across controllers so the HTTP connection pool is reused
+_CLIENT: Optional[AsyncOpenAI] = None
+
+def _get_client() -> AsyncOpenAI:
+    """Get the process-wide OpenRouter client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = AsyncOpenAI(
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            base_url="https://openrouter.ai/api/v1",
+            default_headers={
+                "HTTP-Referer": "https://github.com/0xroyce/NazareAI-Browser-v2",
+                "X-Title": "NazareAI Browser"
+            },
+            http_client=httpx.AsyncClient(
+                http2=True,
+                timeout=httpx.Timeout(60.0, connect=10.0),
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            )
+        )
+    return _CLIENT
+
+async def close_client():
+    """Close the shared OpenRouter client and its connection pool.
+    
+    Call this once on application exit; controllers that are still alive
+    transparently get a fresh client on their next request.
+    """
+    global _CLIENT
+    if _CLIENT is not None:
+        await _CLIENT.close()
+        _CLIENT = None
+
+# Transient failures worth retrying: connection problems, timeouts, 429 and 5xx
+_RETRYABLE = (
+    httpx.TransportError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+def _raise_retries_exhausted(retry_state: tenacity.RetryCallState):
+    """Surface a transient error that outlasted all retries as an LLMAPIError."""
+    error = retry_state.outcome.exception()
+    raise LLMAPIError(f"Failed to get completion after {retry_state.attempt_number} attempts: {str(error)}") from error
+
 def with_llm_error_handling(func):
     """Decorator to handle LLM-related errors."""
     @wraps(func)
@@ -117,9 +308,9 @@ def with_llm_error_handling(func):
         except ValidationError as e:
             logger.error(f"LLM response validation error: {str(e)}")
             raise LLMResponseError(f"Invalid LLM response format: {str(e)}")
-        except tenacity.RetryError as e:
-            logger.error(f"LLM API retry error: {str(e)}")
-            raise LLMAPIError("Failed to get valid response from LLM API after retries")
+        except LLMError:
+            # Already specific (e.g. LLMAPIError once retries are exhausted)
+            raise
         except Exception as e:
             logger.error(f"Unexpected LLM error: {str(e)}")
             raise LLMError(f"Unexpected error in LLM operation: {str(e)}")
@@ -127,105 +318,144 @@ def with_llm_error_handling(func):
 
 class LLMController:
     def __init__(self, page: Page, dom_manager: DOMManager):
-        self.client = AsyncOpenAI(
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1",
-            default_headers={
-                "HTTP-Referer": "https://github.com/0xroyce/NazareAI-Browser-v2",
-                "X-Title": "NazareAI Browser"
-            }
-        )
         self.model = "anthropic/claude-3-opus-20240229"
-        self.action_parser = PydanticOutputParser(pydantic_object=ActionPlan)
         self.cache = ResponseCache()
         
-        self.command_prompt = PromptTemplate(
-            template="""You are an AI browser automation expert. Given the following command and page state,
-            generate a structured plan of actions to accomplish the task.
-
-            IMPORTANT: Return ONLY the JSON object, no additional text or explanation.
-
-            For YouTube tasks, use these reliable selectors:
-            - Search box: "input#search"
-            - Search button: "button#search-icon-legacy"
-            - Video links: "a#video-title-link"
-            - Video player: "#movie_player video"
-            - Play button: ".ytp-play-button"
-            - Pause button: ".ytp-pause-button"
-            - Volume button: ".ytp-mute-button"
-            - Settings button: ".ytp-settings-button"
-            - Full screen button: ".ytp-fullscreen-button"
-
-            Command: {command}
-
-            Current Page State:
-            {page_state}
-
-            Required JSON Structure:
-            {format_instructions}
-
-            JSON Response:""",
-            input_variables=["command", "page_state"],
-            partial_variables={"format_instructions": self.action_parser.get_format_instructions()}
-        )
+        # Static instructions go in a separate system message, precomputed once
+        self.system_prompt = _STATIC_PROMPT_HEAD
 
         self.page = page
         self.dom_manager = dom_manager
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stream_drains: Set[asyncio.Task] = set()
         self._setup_rate_limiter()
 
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The shared client, looked up per request so a closed one is replaced."""
+        return _get_client()
+
     def _setup_rate_limiter(self):
         """Setup rate limiting for API calls."""
         self.rate_limit = {
             'calls_per_minute': 50,
-            'calls': [],
+            'window': 60.0,
+            'calls': deque(),  # time.monotonic() timestamps, oldest first
             'lock': asyncio.Lock()
         }
 
     async def _check_rate_limit(self):
         """Check and enforce rate limits."""
         async with self.rate_limit['lock']:
-            now = datetime.now()
-            minute_ago = now - timedelta(minutes=1)
+            calls = self.rate_limit['calls']
+            window = self.rate_limit['window']
+            now = time.monotonic()
+            cutoff = now - window
             
-            # Remove calls older than 1 minute
-            self.rate_limit['calls'] = [
-                t for t in self.rate_limit['calls']
-                if t > minute_ago
-            ]
+            # Remove calls older than the window
+            while calls and calls[0] < cutoff:
+                calls.popleft()
             
-            if len(self.rate_limit['calls']) >= self.rate_limit['calls_per_minute']:
-                wait_time = (self.rate_limit['calls'][0] - minute_ago).total_seconds()
+            if len(calls) >= self.rate_limit['calls_per_minute']:
+                wait_time = calls[0] + window - now
                 if wait_time > 0:
                     await asyncio.sleep(wait_time)
+                    now = time.monotonic()
+                calls.popleft()
                     
-            self.rate_limit['calls'].append(now)
+            calls.append(now)
 
-    @tenacity.retry(
-        stop=tenacity.stop_after_attempt(3),
-        wait=tenacity.wait_exponential(multiplier=1, min=4, max=10),
-        retry=tenacity.retry_if_exception_type(LLMAPIError)
-    )
-    async def _get_completion(self, prompt: str) -> str:
-        """Get completion from OpenRouter API using OpenAI client with retries and caching."""
+    async def _get_completion(self, prompt: str, system: Optional[str] = None, json_mode: bool = False) -> str:
+        """Get completion from OpenRouter API using OpenAI client with retries and caching.
+        
+        A ``system`` prompt is sent as a separate system message.
+        Concurrent calls with the same prompts share a single API request.
+        With ``json_mode`` the response is streamed and returned as soon as
+        a complete JSON object has arrived.
+        """
+        cache_prompt = f"{system}\n\n{prompt}" if system else prompt
+        cache_key = self.cache._get_cache_key(cache_prompt)
+        
         # Check cache first
-        cached_response = await self.cache.get(prompt)
+        cached_response = await self.cache.get(cache_prompt, key=cache_key)
         if cached_response:
             return cached_response
+        
+        # Join an identical request that is already in flight
+        pending = self._inflight.get(cache_key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            result = await self._request_completion(prompt, system, json_mode)
+            
+            # Cache successful response
+            await self.cache.set(cache_prompt, result, key=cache_key)
             
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Only the owner was cancelled; joined callers get an ordinary
+            # error instead of a cancellation they never asked for
+            future.set_exception(LLMAPIError("Request cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark as retrieved so a future nobody joined doesn't log a warning
+            future.exception()
+            raise
+        finally:
+            del self._inflight[cache_key]
+
+    @tenacity.retry(
+        stop=tenacity.stop_after_attempt(4),
+        wait=tenacity.wait_random_exponential(multiplier=0.5, max=8),
+        retry=tenacity.retry_if_exception_type(_RETRYABLE),
+        retry_error_callback=_raise_retries_exhausted
+    )
+    async def _request_completion(self, prompt: str, system: Optional[str] = None, json_mode: bool = False) -> str:
+        """Request a completion from OpenRouter API, retrying on transient errors."""
         # Check rate limit
         await self._check_rate_limit()
         
+        messages = []
+        if system:
+            messages.append({
+                "role": "system",
+                "content": system
+            })
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        
         try:
+            if json_mode:
+                stream = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=2000,
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                result = await self._read_json_stream(stream)
+                if not result:
+                    raise LLMAPIError("Empty content in OpenRouter API response")
+                return result
+            
             response = await self.client.chat.completions.create(
                 model=self.model,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }],
+                messages=messages,
                 temperature=0.7,
                 max_tokens=2000
             )
             
+            self._log_usage(getattr(response, "usage", None))
+            
             if not response or not response.choices:
                 raise LLMAPIError("Empty response from OpenRouter API")
                 
@@ -233,117 +463,177 @@ class LLMController:
             if not result:
                 raise LLMAPIError("Empty content in OpenRouter API response")
             
-            # Cache successful response
-            await self.cache.set(prompt, result)
-            
             return result
+        except _RETRYABLE as e:
+            # Raised as-is so tenacity can retry it
+            logger.warning(f"Transient LLM API error: {str(e)}")
+            raise
         except Exception as e:
             logger.error(f"LLM API error: {str(e)}")
             if "choices" in str(e):
                 logger.error("Response structure: %s", str(response) if 'response' in locals() else "No response")
             raise LLMAPIError(f"Failed to get completion: {str(e)}")
 
+    async def _read_json_stream(self, stream) -> str:
+        """Accumulate a streamed completion, stopping once a full JSON object has arrived.
+        
+        Brace depth is tracked per chunk so decoding is only attempted when
+        the outermost object could be closed. Falls back to the full text.
+        Once the object is complete the rest of the stream is drained in the
+        background, so the final usage chunk can still be logged.
+        """
+        text = ""
+        start_idx = -1
+        depth = 0
+        handed_off = False
+        try:
+            async for chunk in stream:
+                self._log_usage(getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                text += delta
+                
+                if start_idx < 0:
+                    start_idx = text.find('{')
+                    if start_idx < 0:
+                        continue
+                    depth = text.count('{', start_idx) - text.count('}', start_idx)
+                else:
+                    depth += delta.count('{') - delta.count('}')
+                
+                if depth <= 0:
+                    try:
+                        _, end_idx = _DECODER.raw_decode(text, start_idx)
+                    except json.JSONDecodeError:
+                        # Braces inside strings can skew the count; keep reading
+                        continue
+                    task = asyncio.create_task(self._drain_stream(stream))
+                    self._stream_drains.add(task)
+                    task.add_done_callback(self._stream_drains.discard)
+                    handed_off = True
+                    return text[:end_idx]
+        finally:
+            if not handed_off:
+                await stream.close()
+        return text
+
+    async def _drain_stream(self, stream):
+        """Consume the remainder of a stream for its usage chunk, then close it."""
+        try:
+            async for chunk in stream:
+                self._log_usage(getattr(chunk, "usage", None))
+        except Exception as e:
+            logger.debug(f"Error draining completion stream: {str(e)}")
+        finally:
+            await stream.close()
+
+    @staticmethod
+    def _log_usage(usage):
+        """Log token usage reported by the API, if any."""
+        if usage:
+            logger.debug(
+                f"LLM usage: prompt={usage.prompt_tokens} completion={usage.completion_tokens}"
+            )
+
+    def _fast_plan(self, command: str) -> Optional[Dict[str, Any]]:
+        """Build an action plan for trivial commands without calling the LLM.
+        
+        Supported patterns (case-insensitive):
+        - a bare URL: "https://example.com/page"
+        - "open|go to|navigate to|visit <domain or URL>", when the target has
+          a hostname with an alphabetic, non-file-extension TLD
+        - "search youtube|google for <query>", unless the query chains
+          further steps ("and", "then", "click", "play", ...)
+        
+        Returns None for anything else, so the caller falls back to the LLM.
+        """
+        command = command.strip()
+        
+        url = None
+        if _URL_RE.match(command):
+            parts = urlsplit(command)
+            url = parts._replace(scheme=parts.scheme.lower()).geturl()
+        elif match := _NAVIGATE_RE.match(command):
+            target = match.group(1)
+            if not target.lower().startswith(("http://", "https://")):
+                target = f"https://{target}"
+            parts = urlsplit(target)
+            host = _HOSTNAME_RE.match(parts.hostname or "")
+            if host is None or host.group(1) in _FILE_EXTENSIONS:
+                return None
+            # Lowercase the scheme for the case-sensitive checks downstream
+            url = parts._replace(scheme=parts.scheme.lower()).geturl()
+        elif match := _SEARCH_RE.match(command):
+            engine, query = match.groups()
+            if _FOLLOW_UP_RE.search(query):
+                return None
+            url = _SEARCH_URLS[engine.lower()].format(quote_plus(query.strip()))
+        
+        if url is None:
+            return None
+        
+        return {
+            "url": url,
+            "actions": [{
+                "type": "navigate",
+                "value": url,
+                "selector": "",
+                "wait_for": "",
+                "press_enter": False
+            }],
+            "extraction": {}
+        }
+
     @with_llm_error_handling
     async def interpret_command(self, command: str, page_state: str = "") -> Dict[str, Any]:
         """Enhanced command interpretation with validation."""
-        elements = await self.get_interactive_elements()
+        fast_plan = self._fast_plan(command)
+        if fast_plan is not None:
+            logger.info(f"Planned command without LLM: {command}")
+            return fast_plan
         
-        # Generate the prompt with enhanced context
-        prompt = f"""You are an AI browser automation expert. Generate a structured plan to accomplish the task.
-        Return ONLY a valid JSON object with this exact structure:
-        {{
-            "url": "https://example.com",  // Target URL (must start with http:// or https://)
-            "actions": [  // List of actions to perform
-                {{
-                    "type": "navigate",  // One of: navigate, click, type, extract
-                    "value": "https://example.com",  // URL for navigate, text for type
-                    "selector": "",  // CSS selector or element description
-                    "wait_for": "",  // Optional: Element to wait for after action
-                    "press_enter": false  // Optional: Whether to press Enter after typing
-                }}
-            ],
-            "extraction": {{}}  // Optional: Data to extract after actions
-        }}
-
-        Command: {command}
-
-        Current Page URL: {await self.page.url()}
+        current_url, elements = await self._get_page_snapshot()
         
-        Available Interactive Elements:
-        {self._format_elements(elements)}
+        # Only the per-call context goes in the user message
+        prompt = f"""Command: {command}
 
-        Current Page State:
-        {page_state}
+Current Page URL: {current_url}
 
-        For YouTube tasks, use these reliable selectors:
-        - Search box: "input#search"
-        - Search button: "button#search-icon-legacy"
-        - Video links: "a#video-title-link"
-        - Video player: "#movie_player video"
-        - Play button: ".ytp-play-button"
-        - Pause button: ".ytp-pause-button"
-        - Volume button: ".ytp-mute-button"
-        - Settings button: ".ytp-settings-button"
-        - Full screen button: ".ytp-fullscreen-button"
+Available Interactive Elements:
+{self._format_elements(elements)}
 
-        Return ONLY the JSON object, no additional text.
-        
-        JSON Response:"""
+Current Page State:
+{page_state}
+
+JSON Response:"""
         
-        response = await self._get_completion(prompt)
+        response = await self._get_completion(prompt, system=self.system_prompt, json_mode=True)
         
         # Extract and validate JSON from the response
         try:
-            # Try to find JSON content between curly braces
+            # Decode the first JSON object; raw_decode stops at its closing brace,
+            # so braces in trailing text don't matter
             start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response[start_idx:end_idx]
-                try:
-                    # Parse JSON first
-                    action_plan = json.loads(json_str)
-                    
-                    # Basic validation
-                    if not isinstance(action_plan, dict):
-                        raise LLMResponseError("Response is not a dictionary")
-                    
-                    # Validate URL
-                    if "url" not in action_plan or not isinstance(action_plan["url"], str):
-                        raise LLMResponseError("Missing or invalid 'url' field")
-                    if not action_plan["url"].startswith(("http://", "https://")):
-                        action_plan["url"] = f"https://{action_plan['url']}"
-                    
-                    # Validate actions
-                    if "actions" not in action_plan or not isinstance(action_plan["actions"], list):
-                        raise LLMResponseError("Missing or invalid 'actions' field")
-                    
-                    # Validate each action
-                    valid_types = {"navigate", "click", "type", "extract"}
-                    for action in action_plan["actions"]:
-                        if not isinstance(action, dict):
-                            raise LLMResponseError("Invalid action format")
-                        if "type" not in action or action["type"] not in valid_types:
-                            raise LLMResponseError(f"Invalid action type: {action.get('type')}")
-                        if "value" not in action:
-                            action["value"] = ""
-                        if "selector" not in action:
-                            action["selector"] = ""
-                        if "wait_for" not in action:
-                            action["wait_for"] = ""
-                        if "press_enter" not in action:
-                            action["press_enter"] = False
-                    
-                    # Ensure extraction exists
-                    if "extraction" not in action_plan:
-                        action_plan["extraction"] = {}
-                    
-                    return action_plan
-                    
-                except json.JSONDecodeError as e:
-                    raise LLMResponseError(f"Failed to parse JSON: {str(e)}")
-                except Exception as e:
-                    raise LLMResponseError(f"Failed to validate action plan: {str(e)}")
-            raise LLMResponseError("No valid JSON found in response")
+            if start_idx < 0:
+                raise LLMResponseError("No valid JSON found in response")
+            action_plan, _ = _DECODER.raw_decode(response, start_idx)
+            
+            # Basic validation
+            if not isinstance(action_plan, dict):
+                raise LLMResponseError("Response is not a dictionary")
+            
+            # Validate URL
+            if "url" not in action_plan or not isinstance(action_plan["url"], str):
+                raise LLMResponseError("Missing or invalid 'url' field")
+            if not action_plan["url"].startswith(("http://", "https://")):
+                action_plan["url"] = f"https://{action_plan['url']}"
+            
+            # Validate the whole plan in one pass; model defaults fill in
+            # optional action fields and a missing extraction
+            return _ACTION_PLAN_ADAPTER.validate_python(action_plan).model_dump()
         except Exception as e:
             logger.error(f"Error processing LLM response: {str(e)}")
             logger.error(f"Raw response: {response}")
@@ -352,39 +642,19 @@ class LLMController:
     async def get_interactive_elements(self):
         """Get all pre-annotated interactive elements on the page with enhanced error handling."""
         try:
-            return await self.page.evaluate("""
-                () => {
-                    const elements = document.querySelectorAll('[data-nazare-interactive]');
-                    return Array.from(elements).map(el => ({
-                        id: el.id,
-                        type: el.getAttribute('data-nazare-type'),
-                        role: el.getAttribute('data-nazare-role'),
-                        text: el.getAttribute('data-nazare-text'),
-                        isVisible: el.getAttribute('data-nazare-visible') === 'true'
-                    })).filter(el => el.isVisible);  // Only return visible elements
-                }
-            """)
+            return await self.page.evaluate(_INTERACTIVE_ELEMENTS_JS)
         except Exception as e:
             logger.error(f"Failed to get interactive elements: {str(e)}")
             return []
 
-    def _format_elements(self, elements: List[Dict[str, Any]]) -> str:
-        """Format elements list for prompt context."""
-        if not elements:
-            return "No interactive elements found"
-            
-        formatted = []
-        for el in elements:
-            desc = f"- {el['type']} element"
-            if el['id']:
-                desc += f" (id: {el['id']})"
-            if el['role']:
-                desc += f" with role {el['role']}"
-            if el['text']:
-                desc += f": {el['text']}"
-            formatted.append(desc)
-            
-        return "\n".join(formatted)
+    async def _get_page_snapshot(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """Get the current URL and visible interactive elements in one round-trip."""
+        try:
+            state = await self.page.evaluate(_PAGE_SNAPSHOT_JS)
+            return state['url'], state['elements']
+        except Exception as e:
+            logger.error(f"Failed to get page snapshot: {str(e)}")
+            return await self.page.url(), []
 
     async def summarize_content(self, content: str, max_length: int = 500) -> str:
         """
@@ -422,6 +692,14 @@ class LLMController:
             # If no extraction plan, return empty result
             if not extraction_plan:
                 return {"result": "No extraction plan provided"}
+            
+            # Content that is already JSON with every requested key needs no LLM
+            try:
+                doc = orjson.loads(content)
+                if isinstance(doc, dict) and all(key in doc for key in extraction_plan):
+                    return {key: doc[key] for key in extraction_plan}
+            except orjson.JSONDecodeError:
+                pass
 
             prompt = f"""Extract the following information from the content according to the plan.
             Return ONLY the JSON object, no additional text or explanation.
@@ -435,31 +713,25 @@ class LLMController:
             JSON response:"""
             
             try:
-                response = await self._get_completion(prompt)
+                response = await self._get_completion(prompt, json_mode=True)
                 if not response:
                     return {"error": "No response from LLM"}
                 
-                # First try to parse the entire response as JSON
-                try:
-                    return json.loads(response)
-                except json.JSONDecodeError:
-                    # If that fails, try to extract JSON between curly braces
-                    start_idx = response.find('{')
-                    end_idx = response.rfind('}') + 1
-                    if start_idx >= 0 and end_idx > start_idx:
-                        try:
-                            json_str = response[start_idx:end_idx]
-                            return json.loads(json_str)
-                        except json.JSONDecodeError as e:
-                            return {
-                                "error": f"Invalid JSON in extracted content: {str(e)}",
-                                "raw_response": response[:500]
-                            }
-                    
+                start_idx = response.find('{')
+                if start_idx < 0:
                     # If no JSON found, try to create a simple result
                     return {
                         "result": response.strip()[:1000]  # Return truncated response as plain text
                     }
+                
+                try:
+                    result, _ = _DECODER.raw_decode(response, start_idx)
+                    return result
+                except json.JSONDecodeError as e:
+                    return {
+                        "error": f"Invalid JSON in extracted content: {str(e)}",
+                        "raw_response": response[:500]
+                    }
                     
             except LLMAPIError as e:
                 return {
@@ -489,7 +761,7 @@ class LLMController:
                     id: el.id,
                     type: el.getAttribute('data-nazare-type'),
                     text: el.getAttribute('data-nazare-text'),
-                    isVisible: el.getBoundingClientRect().height > 0
+                    isVisible: el.dataset.nazareVisible === 'true'
                 }));
             }
         """)
@@ -525,12 +797,18 @@ class LLMController:
 
     def _format_elements(self, elements: List[Dict[str, Any]]) -> str:
         """Format elements list for LLM consumption"""
-        formatted = []
-        for el in elements:
-            desc = f"- {el['type']}"
-            if el['role'] != el['type']:
-                desc += f" (role: {el['role']})"
-            if el['text']:
-                desc += f": {el['text']}"
-            formatted.append(desc)
-        return "\n".join(formatted) 
\ No newline at end of file
+        if not elements:
+            return "No interactive elements found"
+        
+        def fmt(el: Dict[str, Any]) -> str:
+            parts = [f"- {el.get('type', '?')}"]
+            if el.get('id'):
+                parts.append(f" (id: {el['id']})")
+            role = el.get('role')
+            if role and role != el.get('type'):
+                parts.append(f" (role: {role})")
+            if el.get('text'):
+                parts.append(f": {el['text']}")
+            return "".join(parts)
+        
+        return "\n".join(fmt(el) for el in elements)
@@ -1,17 +1,68 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Set, Tuple
 from pathlib import Path
 import yaml
 import importlib.util
-import inspect
+import os
+import marshal
+import re
+import asyncio
 from playwright.async_api import Page
 import logging
 
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
 logger = logging.getLogger(__name__)
 
+_HOOKS = ("initialize", "before_navigation", "after_navigation", "before_action", "after_action")
+_URL_HOOKS = ("before_navigation", "after_navigation")
+
+# Spoof common fingerprinting APIs
+_PRIVACY_INIT_JS = """
+Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+Object.defineProperty(navigator, 'plugins', { get: () => [] });
+"""
+
+# Scrolls by `amount` px every `delay` ms until the bottom of the page
+_AUTOSCROLL_JS = """
+({amount, delay}) => new Promise((resolve) => {
+    let totalHeight = 0;
+    let timer = setInterval(() => {
+        window.scrollBy(0, amount);
+        totalHeight += amount;
+
+        if(totalHeight >= document.body.scrollHeight) {
+            clearInterval(timer);
+            resolve();
+        }
+    }, delay);
+})
+"""
+
+# Custom plugin classes keyed by (path, mtime), shared across PluginManager instances
+_PLUGIN_CLASS_CACHE: Dict[Tuple[str, int], type] = {}
+
+
+def _accepts_url_lc(hook) -> bool:
+    """Check whether a hook function declares the optional url_lc parameter."""
+    code = getattr(hook, "__code__", None)
+    if code is None:
+        return False
+    return "url_lc" in code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+
 
 class Plugin:
     """Base class for all plugins."""
     
+    __slots__ = ("config", "enabled")
+    
+    # Set to True if the plugin's hooks must not run concurrently with others
+    ordered = False
+    # Set to True if instances hold no per-page state and may be shared between managers
+    stateless = False
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.enabled = config.get("enabled", True)
@@ -35,76 +86,166 @@ class Plugin:
     async def after_action(self, action: Dict[str, Any]):
         """Called after performing a browser action."""
         pass
+    
+    async def _abort(self, route):
+        """Route handler that blocks the request."""
+        await route.abort()
 
 
 class AdBlocker(Plugin):
     """Plugin for blocking advertisements."""
     
+    __slots__ = ("_ad_re",)
+    stateless = True
+    _BLOCKED_TYPES = frozenset(("image", "media"))
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self._ad_re = re.compile(r"(?:ad|ads|advert|banner|sponsor|tracking)", re.IGNORECASE)
+    
     async def initialize(self, page: Page):
         # Block common ad domains
-        await page.route("**/{ads,analytics,trackers}/**", lambda route: route.abort())
+        await page.route("**/{ads,analytics,trackers}/**", self._abort)
         
-        # Block by resource type
-        await page.route("**/*", lambda route: route.abort() if route.request.resource_type in ["image", "media"] and self._is_ad(route.request.url) else route.continue_())
+        # Block ad images/media; the regex route keeps all other URLs off the Python side
+        await page.route(self._ad_re, self._maybe_abort_ad)
     
-    def _is_ad(self, url: str) -> bool:
-        """Check if a URL is likely an advertisement."""
-        ad_keywords = ["ad", "ads", "advert", "banner", "sponsor", "tracking"]
-        return any(keyword in url.lower() for keyword in ad_keywords)
+    async def _maybe_abort_ad(self, route):
+        """Abort ad-like URLs that load images or media, pass everything else on."""
+        if route.request.resource_type in self._BLOCKED_TYPES:
+            await route.abort()
+        else:
+            await route.fallback()
 
 
 class PrivacyGuard(Plugin):
     """Plugin for enhancing privacy."""
     
+    __slots__ = ()
+    stateless = True
+    
     async def initialize(self, page: Page):
-        # Clear cookies before navigation
-        await page.context.clear_cookies()
-        
-        # Block trackers
-        await page.route("**/{tracking,analytics,pixel}/**", lambda route: route.abort())
-        
-        # Spoof common fingerprinting APIs
-        await page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            Object.defineProperty(navigator, 'plugins', { get: () => [] });
-        """)
+        # Clear cookies, block trackers and install the spoofing script in one round
+        await asyncio.gather(
+            page.context.clear_cookies(),
+            page.route("**/{tracking,analytics,pixel}/**", self._abort),
+            page.add_init_script(_PRIVACY_INIT_JS),
+        )
 
 
 class AutoScroll(Plugin):
     """Plugin for automatic scrolling."""
     
+    __slots__ = ("page",)
+    
+    async def initialize(self, page: Page):
+        self.page = page
+    
     async def after_navigation(self, url: str):
         if not self.config.get("enabled", True):
             return
-            
-        scroll_amount = self.config.get("scroll_amount", 800)
-        scroll_delay = self.config.get("scroll_delay", 1000)
         
-        await self.page.evaluate(f"""
-            async function autoScroll() {{
-                await new Promise((resolve) => {{
-                    let totalHeight = 0;
-                    let distance = {scroll_amount};
-                    let timer = setInterval(() => {{
-                        window.scrollBy(0, distance);
-                        totalHeight += distance;
-                        
-                        if(totalHeight >= document.body.scrollHeight) {{
-                            clearInterval(timer);
-                            resolve();
-                        }}
-                    }}, {scroll_delay});
-                }});
-            }}
-            autoScroll();
-        """)
+        await self.page.evaluate(_AUTOSCROLL_JS, {
+            "amount": self.config.get("scroll_amount", 800),
+            "delay": self.config.get("scroll_delay", 1000),
+        })
+
+
+def _resolve_plugin_class(plugin_file: Path) -> Optional[type]:
+    """Import a custom plugin file and return its Plugin subclass, if any.
+    
+    Touches no manager state, so it is safe to run in a worker thread.
+    """
+    try:
+        key = (str(plugin_file), plugin_file.stat().st_mtime_ns)
+        plugin_cls = _PLUGIN_CLASS_CACHE.get(key)
+        if plugin_cls is None:
+            # Import the module
+            spec = importlib.util.spec_from_file_location(plugin_file.stem, plugin_file)
+            if not spec or not spec.loader:
+                raise ImportError(f"Failed to load spec for {plugin_file}")
+                
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            
+            # Find the first plugin class defined in the module (skip imported ones)
+            plugin_cls = next(
+                (obj for obj in vars(module).values()
+                 if isinstance(obj, type) and issubclass(obj, Plugin) and
+                 obj.__module__ == module.__name__),
+                None,
+            )
+            if plugin_cls is None:
+                return None
+            _PLUGIN_CLASS_CACHE[key] = plugin_cls
+        return plugin_cls
+    
+    except Exception as e:
+        logger.error(f"Error loading custom plugin {plugin_file}: {str(e)}")
+        raise
 
 
 class PluginManager:
+    # Shared instances of stateless plugins, keyed by (class, config items)
+    _pool: Dict[Tuple[type, Tuple], Plugin] = {}
+    
     def __init__(self, config_path: Optional[Path] = None):
         self.plugins: Dict[str, Plugin] = {}
+        self._pending: Dict[str, Path] = {}
+        # Page passed to initialize() and the plugins that have seen it
+        self._page: Optional[Page] = None
+        self._initialized: Set[str] = set()
         self.config = self._load_config(config_path)
         self._load_plugins()
+        self._refresh_enabled()
+    
+    def _refresh_enabled(self):
+        """Rebuild the cached tuple of enabled plugins used by the dispatchers."""
+        self._enabled = tuple(p for p in self.plugins.values() if p.enabled)
+        self._serial = any(p.ordered for p in self._enabled)
+        # Per hook, only the plugins that actually override the base no-op
+        self._hook_plugins = {
+            hook: tuple(p for p in self._enabled if getattr(type(p), hook) is not getattr(Plugin, hook))
+            for hook in _HOOKS
+        }
+        # URL hooks that opt in to receiving the pre-lowered URL
+        self._url_lc_plugins = {
+            hook: tuple(p for p in self._hook_plugins[hook] if _accepts_url_lc(getattr(type(p), hook)))
+            for hook in _URL_HOOKS
+        }
+    
+    async def set_enabled(self, name: str, enabled: bool):
+        """Enable or disable a plugin by name, loading it first if needed.
+        
+        A plugin enabled after initialize() has run is initialized with the
+        same page straight away.
+        """
+        plugin = self._ensure_loaded(name)
+        if plugin is None:
+            raise KeyError(name)
+        if plugin.enabled != enabled and plugin.stateless:
+            # Don't flip the flag on an instance other managers may share
+            plugin = self.plugins[name] = type(plugin)(plugin.config)
+        plugin.enabled = enabled
+        self._refresh_enabled()
+        
+        if enabled and self._page is not None and name not in self._initialized:
+            self._initialized.add(name)
+            await self._safe_init(plugin, self._page)
+    
+    @classmethod
+    def _get_or_create(cls, plugin_cls: type, config: Dict[str, Any]) -> Plugin:
+        """Return a pooled instance for stateless plugins, a fresh one otherwise."""
+        if not plugin_cls.stateless:
+            return plugin_cls(config)
+        try:
+            key = (plugin_cls, tuple(sorted(config.items())))
+            plugin = cls._pool.get(key)
+        except TypeError:  # unorderable keys or unhashable values
+            return plugin_cls(config)
+        if plugin is None:
+            plugin = cls._pool[key] = plugin_cls(config)
+        return plugin
     
     def _load_config(self, config_path: Optional[Path]) -> Dict[str, Any]:
         """Load plugin configuration from YAML file."""
@@ -113,80 +254,132 @@ class PluginManager:
             
         if not config_path.exists():
             return {}
+        
+        # Reuse the marshalled parse result while the YAML file is unchanged
+        mtime = config_path.stat().st_mtime_ns
+        cache_path = config_path.with_suffix(config_path.suffix + ".mcache")
+        try:
+            cached_mtime, config = marshal.loads(cache_path.read_bytes())
+            if cached_mtime == mtime:
+                return config
+        except (OSError, EOFError, ValueError, TypeError):
+            pass
             
-        with open(config_path) as f:
-            return yaml.safe_load(f)
+        with open(config_path, "rb") as f:
+            config = yaml.load(f, Loader=_Loader)
+        
+        try:
+            cache_path.write_bytes(marshal.dumps((mtime, config)))
+        except (OSError, ValueError) as e:
+            logger.debug(f"Not caching plugin config {config_path}: {str(e)}")
+        return config
     
     def _load_plugins(self):
         """Load all enabled plugins."""
         # Load built-in plugins
-        self.plugins["adblocker"] = AdBlocker(self.config.get("adblocker", {}))
-        self.plugins["privacy"] = PrivacyGuard(self.config.get("privacy", {}))
-        self.plugins["autoscroll"] = AutoScroll(self.config.get("autoscroll", {}))
+        self.plugins["adblocker"] = self._get_or_create(AdBlocker, self.config.get("adblocker", {}))
+        self.plugins["privacy"] = self._get_or_create(PrivacyGuard, self.config.get("privacy", {}))
+        self.plugins["autoscroll"] = self._get_or_create(AutoScroll, self.config.get("autoscroll", {}))
         
-        # Load custom plugins from config
+        # Index custom plugins from config; they are imported on first use
         custom_plugins_dir = Path(self.config.get("custom_plugins_dir", "plugins"))
-        if custom_plugins_dir.exists():
-            for plugin_file in custom_plugins_dir.glob("*.py"):
-                try:
-                    self._load_custom_plugin(plugin_file)
-                except Exception as e:
-                    logger.error(f"Failed to load plugin {plugin_file}: {str(e)}")
+        if custom_plugins_dir.is_dir():
+            with os.scandir(custom_plugins_dir) as entries:
+                plugin_files = sorted(
+                    entry.path for entry in entries
+                    if entry.name.endswith(".py") and entry.is_file()
+                )
+            # Sorted so registration order, which serial dispatch follows, is stable
+            for path in plugin_files:
+                plugin_file = Path(path)
+                self._pending[plugin_file.stem] = plugin_file
+    
+    def _ensure_loaded(self, name: str) -> Optional[Plugin]:
+        """Import a pending custom plugin on demand and return it."""
+        plugin_file = self._pending.pop(name, None)
+        if plugin_file is not None:
+            try:
+                self._load_custom_plugin(plugin_file)
+            except Exception as e:
+                logger.error(f"Failed to load plugin {plugin_file}: {str(e)}")
+            self._refresh_enabled()
+        return self.plugins.get(name)
+    
+    async def _load_pending(self):
+        """Import all pending custom plugins concurrently in worker threads.
+        
+        Only module execution runs in the threads; plugins are registered
+        here on the event loop, in index order.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        results = await asyncio.gather(
+            *(asyncio.to_thread(_resolve_plugin_class, path) for path in pending.values()),
+            return_exceptions=True,
+        )
+        for (name, plugin_file), result in zip(pending.items(), results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to load plugin {plugin_file}: {str(result)}")
+            elif result is not None:
+                self.plugins[name] = self._get_or_create(result, self.config.get(name, {}))
+        self._refresh_enabled()
     
     def _load_custom_plugin(self, plugin_file: Path):
         """Load a custom plugin from a Python file."""
-        try:
-            # Import the module
-            spec = importlib.util.spec_from_file_location(plugin_file.stem, plugin_file)
-            if not spec or not spec.loader:
-                raise ImportError(f"Failed to load spec for {plugin_file}")
-                
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            # Find plugin class
-            for name, obj in inspect.getmembers(module):
-                if (inspect.isclass(obj) and 
-                    issubclass(obj, Plugin) and 
-                    obj != Plugin):
-                    # Initialize plugin
-                    config = self.config.get(plugin_file.stem, {})
-                    self.plugins[plugin_file.stem] = obj(config)
-                    break
-                    
-        except Exception as e:
-            logger.error(f"Error loading custom plugin {plugin_file}: {str(e)}")
-            raise
+        plugin_cls = _resolve_plugin_class(plugin_file)
+        if plugin_cls is not None:
+            config = self.config.get(plugin_file.stem, {})
+            self.plugins[plugin_file.stem] = self._get_or_create(plugin_cls, config)
     
     async def initialize(self, page: Page):
         """Initialize all enabled plugins."""
-        for plugin in self.plugins.values():
-            if plugin.enabled:
-                try:
-                    await plugin.initialize(page)
-                except Exception as e:
-                    logger.error(f"Failed to initialize plugin {plugin.__class__.__name__}: {str(e)}")
+        await self._load_pending()
+        self._page = page
+        self._initialized = {name for name, plugin in self.plugins.items() if plugin.enabled}
+        async with asyncio.TaskGroup() as tg:
+            for plugin in self._hook_plugins["initialize"]:
+                tg.create_task(self._safe_init(plugin, page))
+    
+    async def _safe_init(self, plugin: Plugin, page: Page):
+        """Initialize one plugin, logging instead of cancelling its siblings on failure."""
+        try:
+            await plugin.initialize(page)
+        except Exception as e:
+            logger.error(f"Failed to initialize plugin {plugin.__class__.__name__}: {str(e)}")
+    
+    async def _dispatch(self, hook: str, arg: Any):
+        """Run a hook on all enabled plugins, concurrently unless one is ordered."""
+        plugins = self._hook_plugins[hook]
+        if not plugins:
+            return
+        lc_plugins = self._url_lc_plugins.get(hook)
+        if lc_plugins:
+            url_lc = arg.lower()
+            calls = (
+                getattr(p, hook)(arg, url_lc=url_lc) if p in lc_plugins else getattr(p, hook)(arg)
+                for p in plugins
+            )
+        else:
+            calls = (getattr(p, hook)(arg) for p in plugins)
+        if self._serial or len(plugins) == 1:
+            for call in calls:
+                await call
+        else:
+            await asyncio.gather(*calls)
     
     async def before_navigation(self, url: str):
         """Notify plugins before navigation."""
-        for plugin in self.plugins.values():
-            if plugin.enabled:
-                await plugin.before_navigation(url)
+        await self._dispatch("before_navigation", url)
     
     async def after_navigation(self, url: str):
         """Notify plugins after navigation."""
-        for plugin in self.plugins.values():
-            if plugin.enabled:
-                await plugin.after_navigation(url)
+        await self._dispatch("after_navigation", url)
     
     async def before_action(self, action: Dict[str, Any]):
         """Notify plugins before browser action."""
-        for plugin in self.plugins.values():
-            if plugin.enabled:
-                await plugin.before_action(action)
+        await self._dispatch("before_action", action)
     
     async def after_action(self, action: Dict[str, Any]):
         """Notify plugins after browser action."""
-        for plugin in self.plugins.values():
-            if plugin.enabled:
-                await plugin.after_action(action) 
\ No newline at end of file
+        await self._dispatch("after_action", action) 
\ No newline at end of file